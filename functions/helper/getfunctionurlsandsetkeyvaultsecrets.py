@@ -1,6 +1,22 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from azure.core.exceptions import ResourceNotFoundError
 from azure.identity import DefaultAzureCredential
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
 from azure.mgmt.web import WebSiteManagementClient
 from azure.keyvault.secrets import SecretClient
+from azure.keyvault.secrets.aio import SecretClient as AsyncSecretClient
+
+MAX_WORKERS = 16
+# KeyVault throttles secret writes (~25 req/s), so cap in-flight PUTs
+SET_SECRET_CONCURRENCY = 8
+
+logger = logging.getLogger(__name__)
 
 
 # Dev
@@ -35,40 +51,97 @@ vault_uri = "https://pinskvsynwodwtestuks.vault.azure.net/"
 #keyvault_name = "pinskvsynwodwbuilduks"
 #vault_uri = "https://pinskvsynwodwbuilduks.vault.azure.net/"
 
-# Authenticate using DefaultAzureCredential
-credential = DefaultAzureCredential()
+class CachedTokenCredential:
+    """Wraps a credential and caches tokens per scope until near expiry.
+
+    Some credentials in the DefaultAzureCredential chain (e.g. Azure CLI)
+    fetch a fresh token on every get_token call, which spawns a subprocess
+    per secret write. Cache tokens in-process and refresh only within five
+    minutes of expires_on.
+    """
+
+    REFRESH_MARGIN_SECONDS = 300
+
+    def __init__(self, wrapped):
+        self._wrapped = wrapped
+        self._tokens = {}
+
+    def get_token(self, *scopes, **kwargs):
+        # A claims challenge (CAE retry of a 401) or an explicit tenant
+        # must reach the wrapped credential: serving the cached token
+        # would just replay the rejected one.
+        if kwargs.get("claims") or kwargs.get("tenant_id"):
+            return self._wrapped.get_token(*scopes, **kwargs)
+        token = self._tokens.get(scopes)
+        if token is None or token.expires_on - self.REFRESH_MARGIN_SECONDS <= time.time():
+            token = self._wrapped.get_token(*scopes, **kwargs)
+            self._tokens[scopes] = token
+        return token
+
 
-# Create the WebSiteManagementClient
-web_client = WebSiteManagementClient(credential, subscription_id)
+# Credential and clients are built lazily on first use: constructing
+# DefaultAzureCredential at import time probes the whole credential chain
+# (env -> managed identity -> CLI -> ...), which can spawn subprocesses
+# before any function is even called.
+def _credential_excludes() -> dict:
+    # Skip the dev-only probes (browser, VS Code, shared token cache) by
+    # default; each failed probe adds latency to the first token call.
+    # Set AZURE_CRED_MODE=dev to walk the full chain on a workstation.
+    if os.getenv("AZURE_CRED_MODE", "").lower() == "dev":
+        return {}
+    return {
+        "exclude_interactive_browser_credential": True,
+        "exclude_visual_studio_code_credential": True,
+        "exclude_shared_token_cache_credential": True,
+    }
 
-# Create a keyvault secret client
-secret_client = SecretClient(vault_url=vault_uri, credential=credential)
+
+@functools.cache
+def _credential() -> CachedTokenCredential:
+    return CachedTokenCredential(DefaultAzureCredential(**_credential_excludes()))
+
+
+@functools.cache
+def _web_client() -> WebSiteManagementClient:
+    return WebSiteManagementClient(_credential(), subscription_id)
+
+
+@functools.cache
+def _secret_client() -> SecretClient:
+    return SecretClient(vault_url=vault_uri, credential=_credential())
 
 
 def listfunctions(resource_group_name: str, function_app_name: str) -> list:
+    # Consume the pager page by page rather than item by item, and return
+    # the short function names so callers don't re-split "<app>/<function>"
     functions_list = []
-    functions = web_client.web_apps.list_functions(
+    pages = _web_client().web_apps.list_functions(
         resource_group_name, function_app_name
-    )
-    for function in functions:
-        functions_list.append(function.name)
+    ).by_page()
+    for page in pages:
+        functions_list.extend(function.name.split("/", 1)[1] for function in page)
     return functions_list
 
 
 def getfunctionkey(
     resource_group_name: str, function_app_name: str, function_name: str
 ) -> str:
-    function_key = web_client.web_apps.list_function_keys(
+    function_key = _web_client().web_apps.list_function_keys(
         resource_group_name, function_app_name, function_name
     )
     return function_key
 
 
 def getfunctionurl(
-    function_app_name: str, function_name: str, function_key: str
+    function_app_name: str, function_name: str, function_key
 ) -> str:
-    keys_dict = eval(str(function_key).replace("'", '"'))
-    code = keys_dict["additional_properties"]["default"]
+    code = getattr(function_key, "additional_properties", {}).get("default")
+    if code is None:
+        # Some SDK versions surface the keys on .properties instead of
+        # additional_properties
+        code = (getattr(function_key, "properties", None) or {}).get("default")
+    if code is None:
+        raise ValueError(f"No default function key returned for {function_name}")
     function_url = (
         f"https://{function_app_name}.azurewebsites.net/api/{function_name}?code={code}"
     )
@@ -76,29 +149,64 @@ def getfunctionurl(
 
 
 def set_secret(secret_name: str, secret_value: str) -> None:
-    secret_client.set_secret(secret_name, secret_value)
-    return print(f"{secret_name} created")
+    _secret_client().set_secret(secret_name, secret_value)
+    logger.info("%s created", secret_name)
+
+
+def getfunctionurls() -> dict:
+    # Key fetches are independent ARM round-trips, so run them concurrently
+    function_names = listfunctions(resource_group_name, function_app_name)
+    function_urls = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(
+                getfunctionkey, resource_group_name, function_app_name, name
+            ): name
+            for name in function_names
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            function_urls[name] = getfunctionurl(function_app_name, name, future.result())
+    return function_urls
 
 
 def listfunctionurls() -> None:
-    function_list = listfunctions(resource_group_name, function_app_name)
-    for function in function_list:
-        name = function.split("/")[1]
-        function_key = getfunctionkey(resource_group_name, function_app_name, name)
-        function_url = getfunctionurl(function_app_name, name, function_key)
-        print(function_url)
+    for function_url in getfunctionurls().values():
+        logger.info("%s", function_url)
+
+
+async def set_secrets_async(secrets: dict) -> None:
+    # Overlap the KeyVault PUTs with the async client, bounded so we stay
+    # under the vault's write throttle
+    semaphore = asyncio.Semaphore(SET_SECRET_CONCURRENCY)
+    credential = AsyncDefaultAzureCredential(**_credential_excludes())
+    async with credential:
+        async with AsyncSecretClient(vault_url=vault_uri, credential=credential) as client:
+
+            async def put(secret_name: str, secret_value: str) -> None:
+                async with semaphore:
+                    # A GET is much cheaper than a PUT and creates no new
+                    # secret version, so skip writes when nothing changed
+                    try:
+                        existing = (await client.get_secret(secret_name)).value
+                    except ResourceNotFoundError:
+                        existing = None
+                    if existing == secret_value:
+                        logger.info("%s unchanged, skipped", secret_name)
+                        return
+                    await client.set_secret(secret_name, secret_value)
+                    logger.info("%s created", secret_name)
+
+            await asyncio.gather(
+                *(put(name, value) for name, value in secrets.items())
+            )
 
 
 def setkeyvaultsecrets() -> None:
-    function_list = listfunctions(resource_group_name, function_app_name)
-    for function in function_list:
-        name = function.split("/")[1]
-        function_key = getfunctionkey(resource_group_name, function_app_name, name)
-        function_url = getfunctionurl(function_app_name, name, function_key)
-        secret_name = f"function-url-{name}"
-        secret_value = function_url
-        set_secret(secret_name, secret_value)
-    print("All secrets added to KeyVault")
+    function_urls = getfunctionurls()
+    secrets = {f"function-url-{name}": url for name, url in function_urls.items()}
+    asyncio.run(set_secrets_async(secrets))
+    logger.info("All secrets added to KeyVault")
 
 
 # select the function you want to call
@@ -110,4 +218,5 @@ def main() -> None:
     setkeyvaultsecrets()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Shared Service Bus configuration and client helpers for the scripts in
+this directory (purge.py, drain.py).
+
+Loads .env once, parses the connection settings once, and gives every
+script the same auth selection:
+  1) SAS connection string (if SERVICE_BUS_CONNECTION_STR is set)
+  2) Microsoft Entra ID / RBAC via DefaultAzureCredential
+"""
+
+import functools
+import os
+import re
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Load config
+SERVICE_BUS_CONNECTION_STR = os.getenv("SERVICE_BUS_CONNECTION_STR")
+SERVICE_BUS_NAMESPACE_FQDN = os.getenv("SERVICE_BUS_NAMESPACE_FQDN") or os.getenv("SERVICE_BUS_NAMESPACE")
+ENV_TOPIC = os.getenv("SERVICE_BUS_TOPIC")
+ENV_SUBSCRIPTION = os.getenv("SERVICE_BUS_SUBSCRIPTION")
+BATCH_SIZE = int(os.getenv("DLQ_BATCH", "1000"))
+# With prefetch filling the buffer, a short wait per receive is enough;
+# emptiness is confirmed by consecutive empty receives instead of one
+# long one, cutting the drained-tail wait from 5s to 2s.
+WAIT_SECONDS = int(os.getenv("DLQ_WAIT", "1"))
+MAX_EMPTY_RECEIVES = 2
+LOG_INTERVAL_SECONDS = 5
+
+
+_ENDPOINT_RE = re.compile(r"Endpoint=sb://([^./;]+)", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=4)
+def extract_namespace_from_connstr(conn_str: str) -> str:
+    match = _ENDPOINT_RE.search(conn_str)
+    if not match:
+        raise ValueError("Invalid connection string (Missing Endpoint)")
+    return match.group(1)
+
+
+@functools.lru_cache(maxsize=4)
+def to_fqdn(namespace: str) -> str:
+    namespace = (namespace or "").strip()
+    if not namespace:
+        raise SystemExit("ERROR: Set SERVICE_BUS_NAMESPACE_FQDN or SERVICE_BUS_NAMESPACE in your .env")
+    return namespace if "." in namespace else f"{namespace}.servicebus.windows.net"
+
+
+@functools.lru_cache(maxsize=1)
+def namespace_label() -> str:
+    if SERVICE_BUS_CONNECTION_STR:
+        return extract_namespace_from_connstr(SERVICE_BUS_CONNECTION_STR)
+    return to_fqdn(SERVICE_BUS_NAMESPACE_FQDN or "").split(".")[0]
+
+
+def get_client():
+    """Async data-plane client (azure.servicebus.aio.ServiceBusClient)."""
+    from azure.servicebus.aio import ServiceBusClient
+
+    # Prefer SAS if provided (keeps backwards compatibility)
+    if SERVICE_BUS_CONNECTION_STR:
+        ns = extract_namespace_from_connstr(SERVICE_BUS_CONNECTION_STR)
+        print(f"Auth: SAS | Namespace: {ns}")
+        return ServiceBusClient.from_connection_string(SERVICE_BUS_CONNECTION_STR)
+
+    # Otherwise, use AAD via DefaultAzureCredential (matches other scripts)
+    from azure.identity.aio import DefaultAzureCredential
+
+    fqdn = to_fqdn(SERVICE_BUS_NAMESPACE_FQDN or "")
+    credential = DefaultAzureCredential(exclude_interactive_browser_credential=True)
+    print(f"Auth: AAD (DefaultAzureCredential) | Namespace: {fqdn}")
+    return ServiceBusClient(fqdn, credential=credential)
+
+
+@functools.lru_cache(maxsize=1)
+def get_admin_client():
+    """Sync management-plane client (same auth selection as get_client).
+
+    Cached: drain.py calls this from its polling loop, and rebuilding the
+    credential plus client per poll re-runs the whole credential chain.
+    """
+    from azure.servicebus.management import ServiceBusAdministrationClient
+
+    if SERVICE_BUS_CONNECTION_STR:
+        ns = extract_namespace_from_connstr(SERVICE_BUS_CONNECTION_STR)
+        print(f"Auth: SAS | Namespace: {ns}", flush=True)
+        return ServiceBusAdministrationClient.from_connection_string(SERVICE_BUS_CONNECTION_STR)
+
+    from azure.identity import DefaultAzureCredential
+
+    fqdn = to_fqdn(SERVICE_BUS_NAMESPACE_FQDN or "")
+    credential = DefaultAzureCredential(exclude_interactive_browser_credential=True)
+    print(f"Auth: AAD (DefaultAzureCredential) | Namespace: {fqdn}", flush=True)
+    return ServiceBusAdministrationClient(fqdn, credential=credential)
@@ -3,7 +3,7 @@ Drain messages by repeatedly calling our HTTP-triggered Azure Function,
 and STOP only when the Service Bus subscription is actually drained
 (active_message_count == 0 for N stable reads).
 
-Auth for runtime-count checks (mirrors purge.py):
+Auth for runtime-count checks (shared with purge.py via _sb_common.py):
   1) SAS (SERVICE_BUS_CONNECTION_STR) if set
   2) AAD/RBAC via DefaultAzureCredential (az login)
 
@@ -27,6 +27,8 @@ from urllib.parse import urlencode, urljoin, urlparse, parse_qs, urlunparse
 import requests
 from dotenv import load_dotenv
 
+from _sb_common import get_admin_client
+
 load_dotenv()
 
 
@@ -149,44 +151,11 @@ def get_with_retries(
 
     raise RuntimeError("unexpected retry loop exit")
 
-def extract_namespace_from_connstr(conn_str: str) -> str:
-    for part in conn_str.split(";"):
-        if part.strip().lower().startswith("endpoint="):
-            endpoint = part.split("=", 1)[1].strip()
-            endpoint = endpoint.replace("sb://", "").rstrip("/")
-            return endpoint.split(".")[0]
-    raise ValueError("Invalid connection string (Missing Endpoint)")
-
-
-def to_fqdn(namespace: str) -> str:
-    namespace = (namespace or "").strip()
-    if not namespace:
-        raise SystemExit("ERROR: Set SERVICE_BUS_NAMESPACE_FQDN or SERVICE_BUS_NAMESPACE in your .env")
-    return namespace if "." in namespace else f"{namespace}.servicebus.windows.net"
-
-
-def get_admin_client(cfg: Config):
-    from azure.identity import DefaultAzureCredential
-    from azure.servicebus.management import ServiceBusAdministrationClient
-
-    conn_str = (os.getenv("SERVICE_BUS_CONNECTION_STR") or "").strip()
-    if conn_str:
-        ns = extract_namespace_from_connstr(conn_str)
-        print(f"Auth: SAS | Namespace: {ns}", flush=True)
-        return ServiceBusAdministrationClient.from_connection_string(conn_str)
-
-    fqdn = to_fqdn(cfg.sb_namespace_fqdn)
-    credential = DefaultAzureCredential(exclude_interactive_browser_credential=True)
-
-    print(f"Auth: AAD (DefaultAzureCredential) | Namespace: {fqdn}", flush=True)
-    return ServiceBusAdministrationClient(fqdn, credential=credential)
-
-
 def get_runtime_counts(cfg: Config) -> tuple[int, int]:
     if not (cfg.sb_namespace_fqdn and cfg.sb_topic and cfg.sb_subscription):
         raise RuntimeError("Missing SERVICE_BUS_NAMESPACE_FQDN / SERVICE_BUS_TOPIC / SERVICE_BUS_SUBSCRIPTION in .env")
 
-    admin = get_admin_client(cfg)
+    admin = get_admin_client()
     props = admin.get_subscription_runtime_properties(cfg.sb_topic, cfg.sb_subscription)
     return int(props.active_message_count), int(props.dead_letter_message_count)
 
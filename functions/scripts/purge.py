@@ -33,7 +33,7 @@ Environment (.env):
   # SERVICE_BUS_SUBSCRIPTION=<subscription-name>
 
   DLQ_BATCH=1000
-  DLQ_WAIT=5
+  DLQ_WAIT=1
 
   --- How to run the script ---
 
@@ -48,126 +48,250 @@ Environment (.env):
 
   - Optional: override topic/subscription without editing .env
     python purge.py --topic nsip-project --subscription odw-nsip-project-sub --active --limit 7
-"""
-
-import os
-import argparse
-from azure.servicebus import ServiceBusClient, ServiceBusReceiveMode, ServiceBusSubQueue
-from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Load config
-SERVICE_BUS_CONNECTION_STR = os.getenv("SERVICE_BUS_CONNECTION_STR")
-SERVICE_BUS_NAMESPACE_FQDN = os.getenv("SERVICE_BUS_NAMESPACE_FQDN") or os.getenv("SERVICE_BUS_NAMESPACE")
-ENV_TOPIC = os.getenv("SERVICE_BUS_TOPIC")
-ENV_SUBSCRIPTION = os.getenv("SERVICE_BUS_SUBSCRIPTION")
-BATCH_SIZE = int(os.getenv("DLQ_BATCH", "1000"))
-WAIT_SECONDS = int(os.getenv("DLQ_WAIT", "5"))
-
 
-def extract_namespace_from_connstr(conn_str: str) -> str:
-    for part in conn_str.split(";"):
-        if part.strip().lower().startswith("endpoint="):
-            endpoint = part.split("=", 1)[1].strip()
-            endpoint = endpoint.replace("sb://", "").rstrip("/")
-            return endpoint.split(".")[0]
-    raise ValueError("Invalid connection string (Missing Endpoint)")
+  - Optional: drain with multiple concurrent receivers for large backlogs
+    python purge.py --workers 8
 
+  - Optional: stay running and re-purge on an interval over one connection
+    python purge.py --daemon --interval 60
 
-def to_fqdn(namespace: str) -> str:
-    namespace = (namespace or "").strip()
-    if not namespace:
-        raise SystemExit("ERROR: Set SERVICE_BUS_NAMESPACE_FQDN or SERVICE_BUS_NAMESPACE in your .env")
-    return namespace if "." in namespace else f"{namespace}.servicebus.windows.net"
-
-
-def get_client() -> ServiceBusClient:
-    # Prefer SAS if provided (keeps backwards compatibility)
-    if SERVICE_BUS_CONNECTION_STR:
-        ns = extract_namespace_from_connstr(SERVICE_BUS_CONNECTION_STR)
-        print(f"Auth: SAS | Namespace: {ns}")
-        return ServiceBusClient.from_connection_string(SERVICE_BUS_CONNECTION_STR)
-
-    # Otherwise, use AAD via DefaultAzureCredential (matches other scripts)
-    fqdn = to_fqdn(SERVICE_BUS_NAMESPACE_FQDN or "")
-    credential = DefaultAzureCredential(exclude_interactive_browser_credential=True)
-    print(f"Auth: AAD (DefaultAzureCredential) | Namespace: {fqdn}")
-    return ServiceBusClient(fqdn, credential=credential)
-
+  - Optional: for huge backlogs, drop and recreate the subscription outright
+    (one management-plane call instead of receiving every message)
+    python purge.py --nuke
+"""
 
-def namespace_label() -> str:
-    if SERVICE_BUS_CONNECTION_STR:
-        return extract_namespace_from_connstr(SERVICE_BUS_CONNECTION_STR)
-    return to_fqdn(SERVICE_BUS_NAMESPACE_FQDN or "").split(".")[0]
+import argparse
+import asyncio
+import contextlib
+import signal
+import time
+
+from azure.servicebus import ServiceBusReceiveMode, ServiceBusSubQueue
+from azure.servicebus.aio import ServiceBusClient
+
+from _sb_common import (
+    BATCH_SIZE,
+    ENV_SUBSCRIPTION,
+    ENV_TOPIC,
+    LOG_INTERVAL_SECONDS,
+    MAX_EMPTY_RECEIVES,
+    WAIT_SECONDS,
+    get_admin_client,
+    get_client,
+    namespace_label,
+)
 
 
 # DELETE FROM DLQ
-def purge_dlq(topic: str, subscription: str) -> None:
+async def purge_dlq_async(
+    topic: str, subscription: str, workers: int = 1, client: ServiceBusClient | None = None
+) -> None:
     ns = namespace_label()
-    print(f"Purging DLQ: {ns}/{topic}/{subscription}")
-
-    client = get_client()
-    total = 0
-
-    with client:
+    print(f"Purging DLQ: {ns}/{topic}/{subscription} (workers={workers})")
+
+    # One counter slot per worker: each drain loop only ever stores to its
+    # own slot, so the hot path has no shared read-modify-write, and the
+    # final total is reduced with a sum at the end.
+    counts = [0] * workers
+    # Printing every batch becomes a serialization point at high
+    # throughput, so progress is logged at most every few seconds.
+    last_log = time.monotonic()
+
+    async def drain(index: int) -> None:
+        nonlocal last_log
+        # One receiver (AMQP link) per worker; the broker load-balances
+        # messages across concurrent links on the same subscription.
         receiver = client.get_subscription_receiver(
             topic_name=topic,
             subscription_name=subscription,
             sub_queue=ServiceBusSubQueue.DEAD_LETTER,
             receive_mode=ServiceBusReceiveMode.RECEIVE_AND_DELETE,
+            prefetch_count=BATCH_SIZE,
         )
-        with receiver:
-            while True:
-                msgs = receiver.receive_messages(
+        async with receiver:
+            empties = 0
+            local_total = 0
+            while empties < MAX_EMPTY_RECEIVES:
+                msgs = await receiver.receive_messages(
                     max_message_count=BATCH_SIZE,
                     max_wait_time=WAIT_SECONDS,
                 )
                 if not msgs:
-                    break
-                total += len(msgs)
-                print(f"Deleted {total} DLQ messages...")
+                    empties += 1
+                    continue
+                empties = 0
+                local_total += len(msgs)
+                counts[index] = local_total
+                now = time.monotonic()
+                if now - last_log >= LOG_INTERVAL_SECONDS:
+                    last_log = now
+                    print(f"Deleted {sum(counts)} DLQ messages...")
+
+    async with contextlib.AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(get_client())
+        await asyncio.gather(*(drain(i) for i in range(workers)))
+
+    print(f"DONE: Deleted {sum(counts)} DLQ messages.")
+
 
-    print(f"DONE: Deleted {total} DLQ messages.")
+def purge_dlq(topic: str, subscription: str, workers: int = 1) -> None:
+    asyncio.run(purge_dlq_async(topic, subscription, workers=workers))
 
 
 # DELETE FROM ACTIVE SUBSCRIPTION
-def purge_active(topic: str, subscription: str, limit: int | None = None) -> None:
+async def purge_active_async(
+    topic: str,
+    subscription: str,
+    limit: int | None = None,
+    workers: int = 1,
+    client: ServiceBusClient | None = None,
+) -> None:
     ns = namespace_label()
-    print(f"Purging ACTIVE messages: {ns}/{topic}/{subscription}")
+    if limit:
+        # A shared limit can't be enforced exactly across concurrent
+        # receivers, so limited purges stay on a single receiver.
+        workers = 1
+    print(f"Purging ACTIVE messages: {ns}/{topic}/{subscription} (workers={workers})")
     if limit:
         print(f"Limit: Will delete at most {limit} messages.")
 
-    client = get_client()
-    total = 0
+    counts = [0] * workers
+    last_log = time.monotonic()
 
-    with client:
+    async def drain(index: int) -> None:
+        nonlocal last_log
+        # In RECEIVE_AND_DELETE mode prefetched messages are deleted at the
+        # broker as soon as they land in the local buffer, so a limited
+        # purge must not prefetch more than it will actually return.
         receiver = client.get_subscription_receiver(
             topic_name=topic,
             subscription_name=subscription,
             receive_mode=ServiceBusReceiveMode.RECEIVE_AND_DELETE,
+            prefetch_count=0 if limit else BATCH_SIZE,
         )
-        with receiver:
-            while True:
-                if limit and total >= limit:
-                    break
-
-                batch = BATCH_SIZE if not limit else min(BATCH_SIZE, limit - total)
+        async with receiver:
+            empties = 0
+            local_total = 0
+            while empties < MAX_EMPTY_RECEIVES:
+                batch = BATCH_SIZE if not limit else min(BATCH_SIZE, limit - sum(counts))
                 if batch <= 0:
                     break
 
-                msgs = receiver.receive_messages(
+                msgs = await receiver.receive_messages(
                     max_message_count=batch,
                     max_wait_time=WAIT_SECONDS,
                 )
                 if not msgs:
-                    break
+                    empties += 1
+                    continue
+
+                empties = 0
+                local_total += len(msgs)
+                counts[index] = local_total
+                now = time.monotonic()
+                if now - last_log >= LOG_INTERVAL_SECONDS:
+                    last_log = now
+                    print(f"Deleted {sum(counts)} active messages...")
 
-                total += len(msgs)
-                print(f"Deleted {total} active messages...")
+    async with contextlib.AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(get_client())
+        await asyncio.gather(*(drain(i) for i in range(workers)))
 
-    print(f"DONE: Deleted {total} ACTIVE messages.")
+    print(f"DONE: Deleted {sum(counts)} ACTIVE messages.")
+
+
+def purge_active(topic: str, subscription: str, limit: int | None = None, workers: int = 1) -> None:
+    asyncio.run(purge_active_async(topic, subscription, limit=limit, workers=workers))
+
+
+# NUKE: DROP AND RECREATE THE SUBSCRIPTION
+def nuke_subscription(topic: str, subscription: str) -> None:
+    """Delete and recreate the subscription via the management plane.
+
+    For subscriptions holding millions of messages this is one
+    control-plane call instead of transferring every message body over
+    AMQP. Drops ACTIVE and DLQ messages alike; properties and rules are
+    read first and restored on the recreated subscription.
+    """
+    ns = namespace_label()
+    print(f"NUKE: recreating subscription {ns}/{topic}/{subscription}")
+
+    admin = get_admin_client()
+    props = admin.get_subscription(topic, subscription)
+    rules = list(admin.list_rules(topic, subscription))
+
+    admin.delete_subscription(topic, subscription)
+    try:
+        admin.create_subscription(
+            topic,
+            subscription,
+            lock_duration=props.lock_duration,
+            requires_session=props.requires_session,
+            default_message_time_to_live=props.default_message_time_to_live,
+            dead_lettering_on_message_expiration=props.dead_lettering_on_message_expiration,
+            dead_lettering_on_filter_evaluation_exceptions=props.dead_lettering_on_filter_evaluation_exceptions,
+            max_delivery_count=props.max_delivery_count,
+            enable_batched_operations=props.enable_batched_operations,
+            forward_to=props.forward_to,
+            forward_dead_lettered_messages_to=props.forward_dead_lettered_messages_to,
+            auto_delete_on_idle=props.auto_delete_on_idle,
+            status=props.status,
+            user_metadata=props.user_metadata,
+        )
+
+        # create_subscription adds a match-all $Default rule; restore the
+        # original rule set so filtering behaviour is unchanged. A saved
+        # $Default may carry a custom filter/action, so push the saved
+        # version over the auto-created one rather than skipping it.
+        original_rule_names = {rule.name for rule in rules}
+        if "$Default" not in original_rule_names:
+            admin.delete_rule(topic, subscription, "$Default")
+        for rule in rules:
+            if rule.name == "$Default":
+                admin.update_rule(topic, subscription, rule)
+            else:
+                admin.create_rule(
+                    topic, subscription, rule.name, filter=rule.filter, action=rule.action
+                )
+    except Exception:
+        # The subscription is already gone; surface what it looked like so
+        # it can be recreated by hand if need be.
+        print(f"ERROR: failed to recreate {ns}/{topic}/{subscription} after deleting it.")
+        print(f"Saved properties: {props}")
+        print(f"Saved rules: {rules}")
+        raise
+
+    print("DONE: subscription recreated (all messages dropped).")
+
+
+# DAEMON MODE
+async def daemon_async(
+    topic: str,
+    subscription: str,
+    active: bool = False,
+    limit: int | None = None,
+    workers: int = 1,
+    interval: float = 60.0,
+) -> None:
+    # Keep one client (TCP+TLS+AMQP+SASL handshake) alive across purge
+    # passes instead of paying connection setup on every invocation.
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    print(f"Daemon mode: purging every {interval}s (SIGTERM/Ctrl+C to exit)")
+    async with get_client() as client:
+        while not stop.is_set():
+            if active:
+                await purge_active_async(topic, subscription, limit=limit, workers=workers, client=client)
+            else:
+                await purge_dlq_async(topic, subscription, workers=workers, client=client)
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+    print("Daemon stopped.")
 
 
 # MAIN ENTRYPOINT
@@ -191,6 +315,29 @@ if __name__ == "__main__":
         type=int,
         help="Limit active purge to N messages (only used with --active)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of concurrent receivers to drain with (default: 1)",
+    )
+    parser.add_argument(
+        "--nuke",
+        action="store_true",
+        help="Delete and recreate the subscription instead of draining it "
+        "(drops ACTIVE and DLQ messages; preserves properties and rules)",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running, re-purging on an interval with a persistent connection",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=60.0,
+        help="Seconds between purge passes in --daemon mode (default: 60)",
+    )
 
     args = parser.parse_args()
 
@@ -201,9 +348,24 @@ if __name__ == "__main__":
         raise SystemExit("ERROR: Provide --topic or set SERVICE_BUS_TOPIC in .env")
     if not subscription:
         raise SystemExit("ERROR: Provide --subscription or set SERVICE_BUS_SUBSCRIPTION in .env")
-
-    if args.active:
-        purge_active(topic, subscription, limit=args.limit)
+    if args.workers < 1:
+        raise SystemExit("ERROR: --workers must be >= 1")
+
+    if args.nuke:
+        nuke_subscription(topic, subscription)
+    elif args.daemon:
+        asyncio.run(
+            daemon_async(
+                topic,
+                subscription,
+                active=args.active,
+                limit=args.limit,
+                workers=args.workers,
+                interval=args.interval,
+            )
+        )
+    elif args.active:
+        purge_active(topic, subscription, limit=args.limit, workers=args.workers)
     else:
         # Default behaviour: purge DLQ
-        purge_dlq(topic, subscription)
+        purge_dlq(topic, subscription, workers=args.workers)